@@ -1,13 +1,17 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.responses import ORJSONResponse
 
-app = FastAPI()
+# 全エンドポイントで orjson (C実装) によるシリアライズを使う
+app = FastAPI(default_response_class=ORJSONResponse)
+
+# 固定レスポンスは起動時に一度だけエンコードしておく
+_HELLO = b'{"message":"Hello World"}'
+_TEST = b'{"message":"Test"}'
 
 @app.get("/")
 async def read_root():
-    return {
-        "message": "Hello World",
-    }
+    return Response(content=_HELLO, media_type="application/json")
 
 @app.get("/test")
 async def test():
-    return {"message": "Test"}
\ No newline at end of file
+    return Response(content=_TEST, media_type="application/json")
@@ -0,0 +1,27 @@
+"""
+_settle.py
+精算ループの数値カーネル。モデルには依存せず、ユーザーごとの過不足(整数のリスト)だけを
+受け取り、(受取側 index, 支払側 index, 金額) の組のリストを返す。
+"""
+
+from typing import List, Tuple
+
+
+def settle(totals: List[int]) -> List[Tuple[int, int, int]]:
+    # 受け取る側を降順・支払う側を昇順に並べた index 列を作り、2本のポインタで突き合わせる
+    remaining = list(totals)
+    pos = sorted((k for k, t in enumerate(remaining) if t > 0), key=lambda k: -remaining[k])
+    neg = sorted((k for k, t in enumerate(remaining) if t < 0), key=lambda k: remaining[k])
+    result: List[Tuple[int, int, int]] = []
+    i = j = 0
+    while i < len(pos) and j < len(neg):
+        pi, ni = pos[i], neg[j]
+        price = min(remaining[pi], -remaining[ni])
+        result.append((pi, ni, price))
+        remaining[pi] -= price
+        remaining[ni] += price
+        if remaining[pi] == 0:
+            i += 1
+        if remaining[ni] == 0:
+            j += 1
+    return result
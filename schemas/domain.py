@@ -3,143 +3,178 @@ domain.py
 「グループ支払い管理・割り勘計算システム」のコアとなるデータモデルと基本ロジックを提供する。
 """
 
-from typing import List, Any
-from pydantic import BaseModel, root_validator
-import math
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from typing import List, FrozenSet, Optional
+from pydantic import BaseModel, PrivateAttr, root_validator
+
+from schemas._settle import settle
 
 # Base
 class User(BaseModel):
     id: str
     name: str
 
-    def alike(self, other: "User") -> bool:
-        return self.id == other.id
+    # id が同じなら同一ユーザーとして扱い、set / dict のキーにも使えるようにする
+    def __eq__(self, other) -> bool:
+        return isinstance(other, User) and self.id == other.id
+
+    def __hash__(self) -> int:
+        return hash(self.id)
 
 
-class Asset(BaseModel):
+# Asset / Debt / Exchange は内部の集計でしか使わないため、
+# pydantic のバリデーションを通さない軽量な dataclass にする
+@dataclass(frozen=True, slots=True)
+class Asset:
     price: int
     owner: User
 
 
-class Debt(BaseModel):
+@dataclass(frozen=True, slots=True)
+class Debt:
     price: int
     debtor: User
 
 
+@lru_cache(maxsize=4096)
+def _payee_set(ids: tuple) -> FrozenSet[str]:
+    # 同じ顔ぶれの支払いが多いので、同一の payee 構成では frozenset を共有する
+    return frozenset(ids)
+
+
 class Payment(BaseModel):
     id: str
     price: int
     payer: User
     payees: List[User]
+    payee_ids: FrozenSet[str] = None
+    per_payee_price: int = None
+    _asset: Optional[Asset] = PrivateAttr(default=None)
+
+    @root_validator(skip_on_failure=True)
+    def _precompute(cls, values):
+        # payee の id 集合と1人当たりの負担額を一度だけ計算しておく
+        payees = values["payees"]
+        if not payees:
+            raise ValueError("payees must not be empty")
+        values["payee_ids"] = _payee_set(tuple(sorted(p.id for p in payees)))
+        values["per_payee_price"] = values["price"] // len(payees)
+        return values
 
     def debt(self, u: User) -> Debt:
-        # 1人当たりの負担額を計算
-        divider = len(self.payees)
-        per = self.price // divider
-        return Debt(price=per, debtor=u)
+        return Debt(price=self.per_payee_price, debtor=u)
 
     def asset(self, u: User) -> Asset:
         # 支払った人には全額を“資産”として返却
-        return Asset(price=self.price, owner=u)
+        # Asset は不変で内容が payer と price で決まるため、1支払いにつき1つを共有する
+        if self._asset is None:
+            self._asset = Asset(price=self.price, owner=self.payer)
+        return self._asset
 
 
 class Event(BaseModel):
     id: str
     users: List[User]
     payments: List[Payment]
+    _user_id_set: Optional[FrozenSet[str]] = PrivateAttr(default=None)
+
+    @property
+    def user_id_set(self) -> FrozenSet[str]:
+        # users は不変として扱うため、id 集合は初回アクセス時に一度だけ作る
+        if self._user_id_set is None:
+            self._user_id_set = frozenset(u.id for u in self.users)
+        return self._user_id_set
 
     def debt_for_user(self, u: User) -> List[Debt]:
-        if not any(user.alike(u) for user in self.users):
+        if u.id not in self.user_id_set:
             raise ValueError("user not found")
         # 誰からいくら払ってもらったかを抽出
-        return [p.debt(u) for p in self.payments if any(payee.alike(u) for payee in p.payees)]
+        return [p.debt(u) for p in self.payments if u.id in p.payee_ids]
 
     def assets_for_user(self, u: User) -> List[Asset]:
-        if not any(user.alike(u) for user in self.users):
+        if u.id not in self.user_id_set:
             raise ValueError("user not found")
         # 誰にいくらい払ったかを抽出
-        return [p.asset(u) for p in self.payments if p.payer.alike(u)]
+        return [p.asset(u) for p in self.payments if p.payer.id == u.id]
 
     def payment_summaries(self) -> 'PaymentSummaryCollection':
         # 各ユーザーの資産・負債を集計し、PaymentSummaryCollectionを返す
-        summaries: List[PaymentSummary] = []
-        for u in self.users:
-            assets = [p.asset(u) for p in self.payments if p.payer.alike(u)]
-            debts = [p.debt(u) for p in self.payments if any(payee.alike(u) for payee in p.payees)]
-            summaries.append(
-                PaymentSummary(
-                    user=u,
-                    assets=AssetCollection(__root__=assets),
-                    debts=DebtCollection(__root__=debts)
-                )
+        # 支払い一覧を1回だけ走査し、ユーザーidごとに資産・負債を振り分ける
+        assets_by_uid: dict = {u.id: [] for u in self.users}
+        debts_by_uid: dict = {u.id: [] for u in self.users}
+        for p in self.payments:
+            per = p.per_payee_price
+            if p.payer.id in assets_by_uid:
+                assets_by_uid[p.payer.id].append(p.asset(p.payer))
+            for payee in p.payees:
+                debts = debts_by_uid.get(payee.id)
+                if debts is not None:
+                    debts.append(Debt(price=per, debtor=payee))
+        summaries = [
+            PaymentSummary(
+                user=u,
+                assets=AssetCollection(assets_by_uid[u.id]),
+                debts=DebtCollection(debts_by_uid[u.id])
             )
-        return PaymentSummaryCollection(__root__=summaries)
+            for u in self.users
+        ]
+        return PaymentSummaryCollection(summaries)
 
 
-class Exchange(BaseModel):
+@dataclass(frozen=True, slots=True)
+class Exchange:
     price: int
     payee: User
     payer: User
 
 
 # Collections
-class UserCollection(BaseModel):
-    __root__: List[User]
+class UserCollection(list):
+    def __init__(self, users=()):
+        super().__init__(users)
+        # 所属判定を O(1) にするため id 集合を構築時に作る
+        self._ids = frozenset(u.id for u in self)
 
     def contains(self, u: User) -> bool:
-        return any(user.alike(u) for user in self.__root__)
-
-    def __len__(self) -> int:
-        return len(self.__root__)
-
-    def __iter__(self):
-        return iter(self.__root__)
-
+        return u.id in self._ids
 
-class AssetCollection(BaseModel):
-    __root__: List[Asset]
 
+# Asset/Debt/Payment/Exchange のコレクションは要素の再バリデーションが不要なため、
+# pydantic ではなく素の list のサブクラスにする
+class AssetCollection(list):
     def asset_sum(self) -> int:
-        return sum(asset.price for asset in self.__root__)
+        return sum(asset.price for asset in self)
 
-    def __iter__(self):
-        return iter(self.__root__)
-
-
-class DebtCollection(BaseModel):
-    __root__: List[Debt]
 
+class DebtCollection(list):
     def debt_sum(self) -> int:
-        return sum(debt.price for debt in self.__root__)
-
-    def __iter__(self):
-        return iter(self.__root__)
-
+        return sum(debt.price for debt in self)
 
-class PaymentCollection(BaseModel):
-    __root__: List[Payment]
 
+class PaymentCollection(list):
     def extract_debts(self, u: User) -> DebtCollection:
-        debts = [p.debt(u) for p in self.__root__ if any(payee.alike(u) for payee in p.payees)]
-        return DebtCollection(__root__=debts)
+        return DebtCollection(p.debt(u) for p in self if u.id in p.payee_ids)
 
     def extract_assets(self, u: User) -> AssetCollection:
-        assets = [p.asset(u) for p in self.__root__ if p.payer.alike(u)]
-        return AssetCollection(__root__=assets)
+        return AssetCollection(p.asset(u) for p in self if p.payer.id == u.id)
 
-    def __iter__(self):
-        return iter(self.__root__)
+    def debt_sum_for(self, u: User) -> int:
+        # 中間の Debt リストを作らずに1回の走査で合計する
+        return sum(p.per_payee_price for p in self if u.id in p.payee_ids)
 
+    def asset_sum_for(self, u: User) -> int:
+        return sum(p.price for p in self if p.payer.id == u.id)
 
-class ExchangeCollection(BaseModel):
-    __root__: List[Exchange]
 
-    def __iter__(self):
-        return iter(self.__root__)
+class ExchangeCollection(list):
+    pass
 
 
 # 2人の間の一時的な集計
 class TmpSummary:
+    __slots__ = ('user', 'total')
+
     def __init__(self, user: User, total: int) -> None:
         self.user = user
         self.total = total
@@ -148,83 +183,51 @@ class TmpSummary:
         return self.total == 0
 
     def resolve(self, subject: 'TmpSummary') -> Exchange:
+        s, o = self.total, subject.total
         # 両方正負同符号 or どちらかが0の場合は無効
-        if self.total * subject.total >= 0:
+        if s * o >= 0:
             raise ValueError('invalid resolve')
 
-        # 1. 完全に相殺できる場合
-        if self.total + subject.total == 0:
-            price = abs(self.total)
-            self.total = 0
-            subject.total = 0
-            payee = bigger(self, subject).user
-            payer = smaller(self, subject).user
-            return Exchange(price=price, payee=payee, payer=payer)
-
-        # 2. self が相殺される場合 (abs(self) < abs(subject))
-        if abs(self.total) < abs(subject.total):
-            price = abs(self.total)
-            subject.total = self.total + subject.total
-            self.total = 0
-            payee = bigger(self, subject).user
-            payer = smaller(self, subject).user
-            return Exchange(price=price, payee=payee, payer=payer)
-
-        # 3. subject が相殺される場合 (その他)
-        price = abs(subject.total)
-        self.total = self.total + subject.total
-        subject.total = 0
-        payee = bigger(self, subject).user
-        payer = smaller(self, subject).user
+        # 符号が異なるので、小さい方の絶対値だけを移動すれば片方が必ず0になる
+        price = min(abs(s), abs(o))
+        payee = self.user if s > 0 else subject.user
+        payer = subject.user if s > 0 else self.user
+        self.total = s - (price if s > 0 else -price)
+        subject.total = o - (-price if s > 0 else price)
         return Exchange(price=price, payee=payee, payer=payer)
 
 
-def bigger(a: TmpSummary, b: TmpSummary) -> TmpSummary:
-    return a if a.total >= b.total else b
-
-def smaller(a: TmpSummary, b: TmpSummary) -> TmpSummary:
-    return a if a.total <= b.total else b
-
-
-class PaymentSummary(BaseModel):
+@dataclass
+class PaymentSummary:
     user: User
     assets: AssetCollection
     debts: DebtCollection
 
+    @cached_property
     def total(self) -> int:
+        # assets / debts は不変として扱うため、合計は一度だけ計算する
         return self.assets.asset_sum() - self.debts.debt_sum()
 
     def total_abs(self) -> int:
-        return abs(self.total())
+        return abs(self.total)
 
     def tmp_summary(self) -> TmpSummary:
-        return TmpSummary(user=self.user, total=self.total())
+        return TmpSummary(user=self.user, total=self.total)
 
 
-class PaymentSummaryCollection(BaseModel):
-    __root__: List[PaymentSummary]
-    
+class PaymentSummaryCollection(list):
     # ex:
-    # summaries = PaymentSummaryCollection(__root__=[
+    # summaries = PaymentSummaryCollection([
     # PaymentSummary(user=A, paid=2000, share=1000),
     # PaymentSummary(user=B, paid= 500, share=1000),
     # PaymentSummary(user=C, paid= 500, share=1000),
     # ])
-    
-    def __iter__(self):
-        return iter(self.__root__)
 
     def exchnange(self) -> ExchangeCollection:
-        # 各ユーザーの一時的な集計を取得
-        tmps = [ps.tmp_summary() for ps in self.__root__]
-        exchanges = []
-        while True:
-            unsettled = [t for t in tmps if not t.done()]
-            if len(unsettled) < 2:
-                break
-            pos = next((t for t in unsettled if t.total > 0), None)
-            neg = next((t for t in unsettled if t.total < 0), None)
-            if pos is None or neg is None:
-                break
-            exchanges.append(pos.resolve(neg))
-        return ExchangeCollection(__root__=exchanges)
\ No newline at end of file
+        # 数値カーネルに過不足のリストだけを渡し、結果の index を Exchange に引き直す
+        users = [ps.user for ps in self]
+        totals = [ps.total for ps in self]
+        return ExchangeCollection(
+            Exchange(price=price, payee=users[pi], payer=users[ni])
+            for pi, ni, price in settle(totals)
+        )
\ No newline at end of file
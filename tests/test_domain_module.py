@@ -0,0 +1,11 @@
+import importlib
+import sys
+
+import schemas.domain
+
+
+def test_domain_module_loaded_once():
+    """schemas.domain が単一モジュールとして1回だけロードされることを確認"""
+    assert importlib.import_module("schemas.domain") is schemas.domain
+    loaded = [name for name in sys.modules if name.split(".")[-1] == "domain"]
+    assert loaded == ["schemas.domain"]
@@ -0,0 +1,85 @@
+import pytest
+from pydantic import ValidationError
+from schemas.domain import Event, Payment, PaymentCollection, User
+
+
+def _sample_event() -> Event:
+    userA = User(id="A", name="A")
+    userB = User(id="B", name="B")
+    userC = User(id="C", name="C")
+    return Event(
+        id="e1",
+        users=[userA, userB, userC],
+        payments=[
+            # A が 3000 を立て替え、3人で割り勘 (1人 1000)
+            Payment(id="p1", price=3000, payer=userA, payees=[userA, userB, userC]),
+            # B が 1000 を立て替え、A と B で割り勘 (1人 500)
+            Payment(id="p2", price=1000, payer=userB, payees=[userA, userB]),
+        ],
+    )
+
+
+def test_payment_summaries_totals():
+    event = _sample_event()
+    summaries = {s.user.id: s for s in event.payment_summaries()}
+
+    # A: 資産3000 - 負債(1000+500) = +1500
+    assert summaries["A"].total == 1500
+    # B: 資産1000 - 負債(1000+500) = -500
+    assert summaries["B"].total == -500
+    # C: 資産0 - 負債1000 = -1000
+    assert summaries["C"].total == -1000
+
+
+def test_debt_and_assets_for_user():
+    event = _sample_event()
+    userB = User(id="B", name="B")
+
+    debts = event.debt_for_user(userB)
+    assert [d.price for d in debts] == [1000, 500]
+
+    assets = event.assets_for_user(userB)
+    assert [a.price for a in assets] == [1000]
+
+
+def test_invalid_payment_raises_validation_error():
+    userA = User(id="A", name="A")
+
+    # price 欠落はフィールド検証の ValidationError のまま (KeyError にならない)
+    with pytest.raises(ValidationError):
+        Payment(id="p", payer=userA, payees=[userA])
+    # payees が空の場合も構築時点で ValidationError
+    with pytest.raises(ValidationError):
+        Payment(id="p", price=100, payer=userA, payees=[])
+
+
+def test_payment_collection_sums():
+    event = _sample_event()
+    payments = PaymentCollection(event.payments)
+    userA = User(id="A", name="A")
+
+    # extract_*().xxx_sum() と同じ値を中間リストなしで得られる
+    assert payments.debt_sum_for(userA) == payments.extract_debts(userA).debt_sum() == 1500
+    assert payments.asset_sum_for(userA) == payments.extract_assets(userA).asset_sum() == 3000
+
+
+def test_exchange_settles_all_totals():
+    event = _sample_event()
+    exchanges = event.payment_summaries().exchnange()
+
+    # 精算額の合計がユーザーごとの過不足と一致する
+    net = {"A": 0, "B": 0, "C": 0}
+    for ex in exchanges:
+        net[ex.payee.id] += ex.price
+        net[ex.payer.id] -= ex.price
+    assert net == {"A": 1500, "B": -500, "C": -1000}
+
+
+def test_unknown_user_raises():
+    event = _sample_event()
+    stranger = User(id="Z", name="Z")
+
+    with pytest.raises(ValueError):
+        event.debt_for_user(stranger)
+    with pytest.raises(ValueError):
+        event.assets_for_user(stranger)